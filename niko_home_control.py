@@ -1,21 +1,273 @@
+import atexit
+import itertools
 import json
+import logging
+import math
+import re
+import ssl
+import threading
 import time
+import weakref
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from string import Template
 from typing import List, Dict, Any, Optional, Callable, Union
 
 import paho.mqtt.client as mqtt
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Clients that may still hold queued controls; they are sent at interpreter exit if close() wasn't called
+_open_clients = weakref.WeakSet()
+
+
+@atexit.register
+def _send_queued_controls_at_exit():
+    for client in list(_open_clients):
+        client._send_queued_controls()
+
+
+# orjson parses the raw MQTT payload bytes directly and serializes straight to bytes,
+# which paho publishes as-is. Its JSONDecodeError subclasses json.JSONDecodeError.
+if orjson is not None:
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+else:
+    _json_loads = json.loads
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+# Queued device controls are kept as encoded JSON objects and spliced into this envelope
+_CONTROL_PREFIX = b'{"Method":"devices.control","Params":[{"Devices":['
+_CONTROL_SUFFIX = b']}]}'
+
+# Prebuilt control entries for the convenience setters; only filled with values that need no JSON escaping
+_PROPERTY_TEMPLATES = {
+    prop_name: Template('{"Uuid":"$uuid","Properties":[{"%s":"$value"}]}' % prop_name)
+    for prop_name in ("Status", "Position", "Brightness")
+}
+_TEMPLATE_SAFE = re.compile(r"[\w.:-]*")
+
+
+def _topics(*names: str) -> List[tuple]:
+    """Build (topic, qos 0) subscription entries."""
+    return [(name, 0) for name in names]
+
+
+def _params_items(payload: Dict) -> List[Dict]:
+    """Normalize a message's Params (a list of dicts, or a single dict in older firmware) to a list of dicts."""
+    params = payload.get("Params")
+    if isinstance(params, list):
+        return [param for param in params if isinstance(param, dict)]
+    return [params] if isinstance(params, dict) else []
+
+
+# Measurements REST endpoints, filled in with str.format per request
+_LATEST_URL = "{base}/devices/{uuid}?latest=true"
+_RAW_URL = "{base}/devices/{uuid}/properties/{prop}"
+_AGGREGATED_URL = "{base}/devices/{uuid}/properties/{prop}/{interval}"
+_TOTAL_URL = "{base}/devices/{uuid}/total"
+
+
+def _interval_params(start_time: Optional[str], end_time: Optional[str], **params) -> Optional[Dict]:
+    """Build measurement query parameters with the optional interval; None when there are none to encode."""
+    if start_time:
+        params["IntervalStart"] = start_time
+    if end_time:
+        params["IntervalEnd"] = end_time
+    return params or None
+
 
-class NikoHomeControlAPI:
+def _device_uuids(payload: Dict) -> frozenset:
+    """UUIDs of the devices listed in a message's Params."""
+    return frozenset(device.get("Uuid") for param in _params_items(payload)
+                     for device in param.get("Devices", ()) if isinstance(device, dict))
+
+
+def _response_matches(request: Dict, response: Dict) -> bool:
+    """Tell whether a message on a response topic answers the request (responses carry no request id)."""
+    if response.get("Method") != request["Method"]:
+        return False
+    if request["Method"] != "devices.control":
+        return True
+    # Every control (including flushed batches) is answered as devices.control; tell them apart
+    # by the devices they name. Responses that list no devices can't be told apart and are accepted.
+    answered = _device_uuids(response)
+    return not answered or answered == _device_uuids(request)
+
+
+def _property_dicts(properties) -> List[Dict]:
+    """Normalize a device's Properties (a list of dicts, a single dict, or missing) to a list of dicts."""
+    if isinstance(properties, list):
+        return [prop for prop in properties if isinstance(prop, dict)]
+    return [properties] if isinstance(properties, dict) else []
+
+
+def _copy_device(device: Dict) -> Dict:
+    """Copy a device definition down to its property dicts, so callers can't modify cached state."""
+    properties = device.get("Properties")
+    if isinstance(properties, list):
+        return {**device, "Properties": [dict(prop) if isinstance(prop, dict) else prop for prop in properties]}
+    if isinstance(properties, dict):
+        return {**device, "Properties": dict(properties)}
+    return dict(device)
+
+
+class _SSLContextAdapter(HTTPAdapter):
+    """HTTPAdapter that verifies connections with a prebuilt SSL context instead of reloading CA files."""
+
+    def __init__(self, ssl_context: Optional[ssl.SSLContext] = None, **kwargs):
+        self._ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self._ssl_context is not None:
+            kwargs["ssl_context"] = self._ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+
+class _EventRouter:
+    """
+    Routing of event and error messages to the registered callbacks, shared by the threaded
+    and asyncio clients. Subclasses provide the *_callbacks lists and may override _emit to
+    change how a callback is invoked.
+    """
+
+    # Event handlers keyed by exact method name or by "<prefix>." for method families
+    _EVENT_HANDLERS = {
+        "devices.": "_emit_devices",
+        "locations.": "_emit_locations",
+        "time.published": "_emit_time",
+        "systeminfo.published": "_emit_system_info",
+        "notifications.raised": "_emit_notifications",
+    }
+
+    def _init_dispatch(self):
+        """Bind the event handlers once, so routing a message is a dict lookup."""
+        self._dispatch = {key: getattr(self, name) for key, name in self._EVENT_HANDLERS.items()}
+
+    def _route_event(self, topic: str, payload: Dict):
+        """Pass a decoded event or error message to the matching callbacks."""
+        method = payload.get("Method")
+
+        # Handle error messages
+        error_code = payload.get("ErrCode")
+        if error_code:
+            if self.error_callbacks:
+                self._emit(self.error_callbacks, {
+                    "topic": topic,
+                    "method": method,
+                    "error_code": error_code,
+                    "error_message": payload.get("ErrMessage")
+                })
+            return
+
+        if not method:
+            return
+
+        # Exact method names first, then the "devices." / "locations." prefixes
+        handler = self._dispatch.get(method) or self._dispatch.get(method.split(".", 1)[0] + ".")
+        if handler is not None:
+            params = _params_items(payload)
+            handler(method, params[0] if params else {}, topic)
+
+    @staticmethod
+    def _emit(callbacks: List[Callable[[Dict], None]], event: Dict):
+        """Pass one event dictionary to every callback; callbacks share it and must not modify it."""
+        for callback in callbacks:
+            callback(event)
+
+    def _emit_devices(self, method: str, params: Dict, topic: str):
+        """Route a device event to the device callbacks."""
+        if self.device_callbacks:
+            self._emit(self.device_callbacks, {
+                "method": method,
+                "devices": params.get("Devices", []),
+                "topic": topic
+            })
+
+    def _emit_locations(self, method: str, params: Dict, topic: str):
+        """Route a location event to the location callbacks."""
+        if self.location_callbacks:
+            self._emit(self.location_callbacks, {
+                "method": method,
+                "locations": params.get("Locations", []),
+                "topic": topic
+            })
+
+    def _emit_time(self, method: str, params: Dict, topic: str):
+        """Route a time event to the system callbacks."""
+        if self.system_callbacks:
+            self._emit(self.system_callbacks, {
+                "method": method,
+                "time_info": params.get("TimeInfo", {}),
+                "topic": topic
+            })
+
+    def _emit_system_info(self, method: str, params: Dict, topic: str):
+        """Route a system info event to the system callbacks."""
+        if self.system_callbacks:
+            self._emit(self.system_callbacks, {
+                "method": method,
+                "system_info": params.get("SystemInfo", {}),
+                "topic": topic
+            })
+
+    def _emit_notifications(self, method: str, params: Dict, topic: str):
+        """Route a notification event to the notification callbacks."""
+        if self.notification_callbacks:
+            self._emit(self.notification_callbacks, {
+                "method": method,
+                "notifications": params.get("Notifications", []),
+                "topic": topic
+            })
+
+
+class NikoHomeControlAPI(_EventRouter):
     """
     Complete implementation of the Niko Home Control API based on the official documentation.
     Provides methods to interact with the Niko Home Control system via MQTT and REST.
+
+    Event callbacks of the same kind all receive the same event dictionary, so callbacks
+    should treat it as read-only.
+
+    Device control commands are published with QoS 0: they set an absolute state and the
+    device event that follows shows whether it was applied, so a lost command can simply be
+    sent again. Notification updates use QoS 1 so the result reflects broker delivery.
     """
 
-    def __init__(self, host: str, username: str, jwt_token: str, ca_cert_path: str = None):
+    # Always subscribed on connect; device events keep the device index current
+    _EVENT_TOPICS = _topics("hobby/control/devices/evt")
+
+    # Only subscribed once a callback of the matching kind is registered, so the broker
+    # doesn't send traffic nobody handles
+    _LOCATION_TOPICS = _topics("hobby/control/locations/evt")
+    _NOTIFICATION_TOPICS = _topics("hobby/notification/evt")
+    _SYSTEM_TOPICS = _topics("hobby/system/evt")
+    _ERROR_TOPICS = _topics(
+        "hobby/control/devices/err",
+        "hobby/control/locations/err",
+        "hobby/notification/err",
+        "hobby/system/err",
+    )
+
+    # Properties a device must report to count as a comfort sensor
+    _COMFORT_PROPERTIES = frozenset(("AmbientTemperature", "Humidity"))
+
+    def __init__(self, host: str, username: str, jwt_token: str, ca_cert_path: str = None,
+                 batch_interval: float = 0.01, max_batch: int = 64, device_cache_ttl: float = 5.0):
         """
         Initialize the Niko Home Control API.
 
@@ -24,18 +276,44 @@ class NikoHomeControlAPI:
             username: MQTT username provided by Niko (typically "hobby")
             jwt_token: JWT token provided by Niko
             ca_cert_path: Path to CA certificate file (optional)
+            batch_interval: Seconds to collect fire-and-forget device controls before publishing them
+            max_batch: Maximum number of device controls combined into a single publish
+            device_cache_ttl: Seconds a device list is reused for status lookups before it is refreshed
         """
         self.host = host
         self.username = username
         self.jwt_token = jwt_token
         self.ca_cert_path = ca_cert_path
         self._connected = False
+        self._connected_evt = threading.Event()
+
+        # Pending fire-and-forget device controls, published together by flush()
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self._pending_controls = {}
+        self._pending_lock = threading.Lock()
+        self._flush_timer = None
+        self._last_control_publish = None
+        _open_clients.add(self)
+
+        # Devices by UUID, kept up to date from device events between list_devices() refreshes
+        self.device_cache_ttl = device_cache_ttl
+        self._device_index = {}
+        self._device_index_ts = -math.inf
+
+        # One in-flight request per response topic, since the broker's replies carry no request id
+        self._request_locks = defaultdict(threading.Lock)
+
+        # One TLS context (CA bundle parsed once) shared by the MQTT and REST connections
+        self._ssl_context = None
+        if ca_cert_path:
+            self._ssl_context = ssl.create_default_context(cafile=ca_cert_path)
 
         # MQTT client setup with Callback API v2
         self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
         self.mqtt_client.username_pw_set(username, jwt_token)
-        if ca_cert_path:
-            self.mqtt_client.tls_set(ca_cert_path)
+        if self._ssl_context is not None:
+            self.mqtt_client.tls_set_context(self._ssl_context)
 
         # Callback handlers
         self.device_callbacks = []
@@ -43,6 +321,14 @@ class NikoHomeControlAPI:
         self.notification_callbacks = []
         self.system_callbacks = []
         self.error_callbacks = []
+        self._callback_topics = [
+            (self.location_callbacks, self._LOCATION_TOPICS),
+            (self.notification_callbacks, self._NOTIFICATION_TOPICS),
+            (self.system_callbacks, self._SYSTEM_TOPICS),
+            (self.error_callbacks, self._ERROR_TOPICS),
+        ]
+
+        self._init_dispatch()
 
         # Assign MQTT callbacks
         self.mqtt_client.on_connect = self._on_connect
@@ -53,6 +339,14 @@ class NikoHomeControlAPI:
         self.mqtt_port = 8884
         self.rest_base_url = f"https://{host}/measurements/v1"
 
+        # Shared HTTP session so REST calls reuse the TLS connection to the controller
+        self._http = requests.Session()
+        self._http.headers["Authorization"] = f"Bearer {jwt_token}"
+        self._http.verify = self._ssl_context is not None
+        self._http.mount("https://", _SSLContextAdapter(self._ssl_context, pool_connections=4, pool_maxsize=16,
+                                                        max_retries=Retry(total=3, backoff_factor=0.2)))
+        self._measurement_executor = None
+
         # Connect to MQTT broker with retry logic
         self._connect_mqtt()
 
@@ -63,19 +357,14 @@ class NikoHomeControlAPI:
                 self.mqtt_client.connect(self.host, self.mqtt_port)
                 self.mqtt_client.loop_start()
 
-                # Wait for connection to establish
-                wait_time = 0
-                while not self._connected and wait_time < 5:
-                    time.sleep(0.1)
-                    wait_time += 0.1
-
-                if self._connected:
+                # Wait for connection to establish (set by _on_connect on CONNACK)
+                if self._connected_evt.wait(timeout=5.0):
                     return
 
                 self.mqtt_client.disconnect()
 
             except Exception as e:
-                print(f"Connection attempt {attempt + 1} failed: {str(e)}")
+                logger.warning("Connection attempt %d failed: %s", attempt + 1, e)
                 if attempt < retries - 1:
                     time.sleep(delay)
 
@@ -85,106 +374,69 @@ class NikoHomeControlAPI:
         """Callback when MQTT connects."""
         if reason_code == 0:
             self._connected = True
-            print("Connected to MQTT broker")
-            # Subscribe to event topics
-            client.subscribe("hobby/control/devices/evt")
-            client.subscribe("hobby/control/locations/evt")
-            client.subscribe("hobby/notification/evt")
-            client.subscribe("hobby/system/evt")
-            client.subscribe("hobby/control/devices/err")
-            client.subscribe("hobby/control/locations/err")
-            client.subscribe("hobby/notification/err")
-            client.subscribe("hobby/system/err")
+            self._connected_evt.set()
+            logger.info("Connected to MQTT broker")
+            # Subscribe to event topics in a single SUBSCRIBE packet
+            topics = list(self._EVENT_TOPICS)
+            for callbacks, callback_topics in self._callback_topics:
+                if callbacks:
+                    topics.extend(callback_topics)
+            client.subscribe(topics)
         else:
-            print(f"Connection failed with code {reason_code}")
+            self._connected_evt.clear()
+            logger.error("Connection failed with code %s", reason_code)
 
     def _on_disconnect(self, client, userdata, disconnect_flags, reason_code, properties=None):
         """Callback when MQTT disconnects."""
         self._connected = False
-        print(f"Disconnected from MQTT broker (reason: {reason_code}, flags: {disconnect_flags})")
+        self._connected_evt.clear()
+        # Events may be missed while disconnected, so force a refresh on the next lookup
+        self._device_index_ts = -math.inf
+        logger.info("Disconnected from MQTT broker (reason: %s, flags: %s)", reason_code, disconnect_flags)
 
     def _on_message(self, client, userdata, message):
         """Callback when MQTT message is received."""
         try:
-            payload = json.loads(message.payload.decode())
-            method = payload.get("Method")
-            params = payload.get("Params", {})
-            error_code = payload.get("ErrCode")
-            error_message = payload.get("ErrMessage")
-
-            # Handle error messages
-            if error_code:
-                for callback in self.error_callbacks:
-                    callback({
-                        "topic": message.topic,
-                        "method": method,
-                        "error_code": error_code,
-                        "error_message": error_message
-                    })
-                return
-
-            # Handle different parameter formats
-            if isinstance(params, list):
-                # When Params is a list, extract devices/locations from the first item
-                if params and isinstance(params[0], dict):
-                    devices = params[0].get("Devices", [])
-                    locations = params[0].get("Locations", [])
-                    notifications = params[0].get("Notifications", [])
-                    time_info = params[0].get("TimeInfo", {})
-                    system_info = params[0].get("SystemInfo", {})
-            else:
-                # When Params is a dict (older format)
-                devices = params.get("Devices", [])
-                locations = params.get("Locations", [])
-                notifications = params.get("Notifications", [])
-                time_info = params.get("TimeInfo", {})
-                system_info = params.get("SystemInfo", {})
-
-            # Route messages to appropriate handlers
-            if method and method.startswith("devices."):
-                for callback in self.device_callbacks:
-                    callback({
-                        "method": method,
-                        "devices": devices,
-                        "topic": message.topic
-                    })
-
-            elif method and method.startswith("locations."):
-                for callback in self.location_callbacks:
-                    callback({
-                        "method": method,
-                        "locations": locations,
-                        "topic": message.topic
-                    })
-
-            elif method == "time.published":
-                for callback in self.system_callbacks:
-                    callback({
-                        "method": method,
-                        "time_info": time_info,
-                        "topic": message.topic
-                    })
-
-            elif method == "systeminfo.published":
-                for callback in self.system_callbacks:
-                    callback({
-                        "method": method,
-                        "system_info": system_info,
-                        "topic": message.topic
-                    })
-
-            elif method == "notifications.raised":
-                for callback in self.notification_callbacks:
-                    callback({
-                        "method": method,
-                        "notifications": notifications,
-                        "topic": message.topic
-                    })
-
+            self._route_event(message.topic, _json_loads(message.payload))
         except json.JSONDecodeError:
-            print(f"Failed to decode MQTT message: {message.payload}")
+            logger.warning("Failed to decode MQTT message: %r", message.payload)
+        except Exception as e:
+            logger.error("Error processing message: %s", e)
+
+    def _emit_devices(self, method: str, params: Dict, topic: str):
+        """Route a device event to the device index and device callbacks."""
+        try:
+            self._update_device_index(method, params.get("Devices", []))
         except Exception as e:
-            print(f"Error processing message: {str(e)}")
+            # Callbacks still get the event; the index is refreshed on the next lookup instead
+            logger.warning("Failed to apply %s to the device index: %s", method, e)
+            self._device_index_ts = -math.inf
+        super()._emit_devices(method, params, topic)
+
+    def _update_device_index(self, method: str, devices: List[Dict]):
+        """Apply a device event to the cached device index."""
+        for device in devices:
+            device_uuid = device.get("Uuid")
+            if method == "devices.removed":
+                self._device_index.pop(device_uuid, None)
+                continue
+
+            cached = self._device_index.get(device_uuid)
+            if cached is None:
+                # Only devices.added carries a full definition; others are picked up on refresh
+                if method == "devices.added":
+                    self._device_index[device_uuid] = device
+                continue
+
+            # Status events only carry the changed properties, so merge them into the cached ones
+            properties = {k: v for p in _property_dicts(cached.get("Properties")) for k, v in p.items()}
+            for prop in _property_dicts(device.get("Properties")):
+                properties.update(prop)
+            self._device_index[device_uuid] = {
+                **cached,
+                **device,
+                "Properties": [{k: v} for k, v in properties.items()]
+            }
 
     def ensure_connection(self):
         """Ensure we have an active MQTT connection."""
@@ -192,25 +444,33 @@ class NikoHomeControlAPI:
             self._connect_mqtt()
 
     # Callback registration methods
+    def _register_callback(self, callbacks: List[Callable[[Dict], None]], callback: Callable[[Dict], None],
+                           topics: List[tuple]):
+        """Add a callback, subscribing to its topics when it is the first of its kind."""
+        first = not callbacks
+        callbacks.append(callback)
+        if first and self._connected:
+            self.mqtt_client.subscribe(topics)
+
     def register_device_callback(self, callback: Callable[[Dict], None]):
         """Register a callback for device events."""
         self.device_callbacks.append(callback)
 
     def register_location_callback(self, callback: Callable[[Dict], None]):
         """Register a callback for location events."""
-        self.location_callbacks.append(callback)
+        self._register_callback(self.location_callbacks, callback, self._LOCATION_TOPICS)
 
     def register_notification_callback(self, callback: Callable[[Dict], None]):
         """Register a callback for notification events."""
-        self.notification_callbacks.append(callback)
+        self._register_callback(self.notification_callbacks, callback, self._NOTIFICATION_TOPICS)
 
     def register_system_callback(self, callback: Callable[[Dict], None]):
         """Register a callback for system events."""
-        self.system_callbacks.append(callback)
+        self._register_callback(self.system_callbacks, callback, self._SYSTEM_TOPICS)
 
     def register_error_callback(self, callback: Callable[[Dict], None]):
         """Register a callback for error messages."""
-        self.error_callbacks.append(callback)
+        self._register_callback(self.error_callbacks, callback, self._ERROR_TOPICS)
 
     # Device Management Methods
     def list_devices(self) -> List[Dict]:
@@ -229,15 +489,17 @@ class NikoHomeControlAPI:
             payload
         )
 
-        if not response or "Params" not in response:
+        if not response or response.get("Method") != "devices.list" or "Params" not in response:
             return []
 
         # Extract devices from response
-        devices = []
-        for param in response["Params"]:
-            if isinstance(param, dict) and "Devices" in param:
-                devices.extend(param["Devices"])
+        devices = list(itertools.chain.from_iterable(
+            param["Devices"] for param in _params_items(response) if "Devices" in param
+        ))
 
+        # Only a verified devices.list response may replace the index; it keeps its own copies
+        self._device_index = {d["Uuid"]: _copy_device(d) for d in devices if "Uuid" in d}
+        self._device_index_ts = time.monotonic()
         return devices
 
     def control_device(self, device_uuid: str, properties: Union[Dict[str, Any], List[Dict[str, Any]]],
@@ -256,6 +518,14 @@ class NikoHomeControlAPI:
         Note:
             The properties must be formatted as a list of property dictionaries according to the Niko API spec.
             For example, [{"Position": "50"}] or [{"Status": "On" }, {"Brightness": "75"}]
+
+            Without wait_for_response the control is queued and published together with other
+            controls issued within batch_interval seconds. Use flush() to send queued controls now.
+            A newer queued control for the same device and properties replaces the older one.
+            Queued controls are sent with QoS 0 from a background timer: if the connection is lost
+            before they go out they are dropped and only a warning is logged. They are also sent
+            by close() and at interpreter exit; a process killed before then loses them. Use
+            wait_for_response=True when the caller needs to know the control was applied.
         """
         self.ensure_connection()
 
@@ -263,29 +533,98 @@ class NikoHomeControlAPI:
         if isinstance(properties, dict):
             properties = properties
 
-        payload = {
-            "Method": "devices.control",
-            "Params": [{
-                "Devices": [{
-                    "Uuid": device_uuid,
-                    "Properties": properties  # This is now always a list
-                }]
-            }]
+        device = {
+            "Uuid": device_uuid,
+            "Properties": properties  # This is now always a list
         }
 
         if wait_for_response:
+            # Keep ordering with any queued fire-and-forget controls
+            self.flush()
             return self._mqtt_request(
                 "hobby/control/devices/cmd",
                 "hobby/control/devices/rsp",
-                payload
+                {"Method": "devices.control", "Params": [{"Devices": [device]}]}
             )
         else:
-            result = self.mqtt_client.publish(
-                "hobby/control/devices/cmd",
-                json.dumps(payload))
-            result.wait_for_publish()
+            names = tuple(name for prop in _property_dicts(properties) for name in prop)
+            self._enqueue_control((device_uuid, names), _json_dumps(device))
             return None
 
+    def _publish_property(self, device_uuid: str, prop_name: str, value: Any,
+                          wait_for_response: bool = False) -> Optional[Dict]:
+        """
+        Set a single device property, filling in a prebuilt control entry instead of serializing a dict.
+
+        Args:
+            device_uuid: UUID of the device
+            prop_name: Name of the property to set
+            value: New property value (sent as a string)
+            wait_for_response: Whether to wait for a response
+
+        Returns:
+            Response payload if wait_for_response is True, None otherwise
+        """
+        value = str(value)
+        if wait_for_response:
+            return self.control_device(device_uuid, [{prop_name: value}], wait_for_response=True)
+
+        template = _PROPERTY_TEMPLATES.get(prop_name)
+        if template is not None and _TEMPLATE_SAFE.fullmatch(device_uuid) and _TEMPLATE_SAFE.fullmatch(value):
+            entry = template.substitute(uuid=device_uuid, value=value).encode()
+        else:
+            entry = _json_dumps({"Uuid": device_uuid, "Properties": [{prop_name: value}]})
+
+        self.ensure_connection()
+        self._enqueue_control((device_uuid, (prop_name,)), entry)
+        return None
+
+    def _enqueue_control(self, key: tuple, device: bytes):
+        """
+        Queue an encoded device control entry, publishing the batch once it is full.
+
+        Entries are keyed by (device UUID, property names): a newer control for the same key
+        replaces the queued one and moves to the end, so e.g. the steps of a dimmer ramp collapse
+        into the final value instead of relying on how the controller orders a batch.
+        """
+        with self._pending_lock:
+            self._pending_controls.pop(key, None)
+            self._pending_controls[key] = device
+            if len(self._pending_controls) < self.max_batch:
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(self.batch_interval, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+
+        self.flush()
+
+    def flush(self):
+        """
+        Publish all queued device controls as a single devices.control message.
+
+        Controls sent with wait_for_response=False are collected for batch_interval seconds
+        (or until max_batch entries are queued). Call this when they must be sent right away.
+        The message is handed to the MQTT client without waiting for it to be written; messages
+        are still sent in the order they were published.
+        """
+        with self._pending_lock:
+            batch = self._pending_controls
+            self._pending_controls = {}
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+
+        if not batch:
+            return
+
+        payload = _CONTROL_PREFIX + b",".join(batch.values()) + _CONTROL_SUFFIX
+        self._last_control_publish = self.mqtt_client.publish("hobby/control/devices/cmd", payload, qos=0)
+        if self._last_control_publish.rc != mqtt.MQTT_ERR_SUCCESS:
+            # Usually runs on the batch timer thread, so there is no caller to raise to
+            logger.warning("Failed to publish %d queued device control(s): %s",
+                           len(batch), mqtt.error_string(self._last_control_publish.rc))
+
     def set_device_position(self, device_uuid: str, position: int, wait_for_response: bool = False) -> Optional[Dict]:
         """
         Convenience method to set device position (for blinds, etc.)
@@ -298,11 +637,7 @@ class NikoHomeControlAPI:
         Returns:
             Response payload if wait_for_response is True, None otherwise
         """
-        return self.control_device(
-            device_uuid,
-            [{"Position": str(position)}],  # As list with one property dict
-            wait_for_response=wait_for_response
-        )
+        return self._publish_property(device_uuid, "Position", position, wait_for_response)
 
     def set_device_status(self, device_uuid: str, status: str, wait_for_response: bool = False) -> Optional[Dict]:
         """
@@ -316,11 +651,7 @@ class NikoHomeControlAPI:
         Returns:
             Response payload if wait_for_response is True, None otherwise
         """
-        return self.control_device(
-            device_uuid,
-            [{"Status": status}],  # As list with one property dict
-            wait_for_response=wait_for_response
-        )
+        return self._publish_property(device_uuid, "Status", status, wait_for_response)
 
     def set_device_brightness(self, device_uuid: str, brightness: int, wait_for_response: bool = False) -> Optional[
         Dict]:
@@ -335,16 +666,15 @@ class NikoHomeControlAPI:
         Returns:
             Response payload if wait_for_response is True, None otherwise
         """
-        return self.control_device(
-            device_uuid,
-            [{"Brightness": str(brightness)}],  # As list with one property dict
-            wait_for_response=wait_for_response
-        )
+        return self._publish_property(device_uuid, "Brightness", brightness, wait_for_response)
 
     def get_device_status(self, device_uuid: str) -> Dict | None:
         """
         Get the current status of a device.
 
+        The device list is cached for device_cache_ttl seconds and kept up to date from device
+        events in between, so repeated lookups don't each cost a broker round-trip.
+
         Args:
             device_uuid: UUID of the device
 
@@ -355,11 +685,10 @@ class NikoHomeControlAPI:
             status = api.get_device_status("device-uuid")
             print(f"Status: {status['status']}, Position: {status['position']}")
         """
-        devices = self.list_devices()
-        for device in devices:
-            if device.get('Uuid') == device_uuid:
-                return device
-        return None
+        if time.monotonic() - self._device_index_ts >= self.device_cache_ttl:
+            self.list_devices()
+        device = self._device_index.get(device_uuid)
+        return _copy_device(device) if device is not None else None
 
     def get_dimmer_status(self, device_uuid: str) -> Dict:
         """
@@ -375,36 +704,26 @@ class NikoHomeControlAPI:
             status = api.get_dimmer_status("dimmer-uuid")
             print(f"Status: {status['status']}, Brightness: {status['brightness']}")
         """
-        devices = self.list_devices()
-        for device in devices:
-            if device.get('Uuid') == device_uuid:
-                if device.get('Model') != 'dimmer':
-                    raise ValueError("Device is not a dimmer")
-
-                status = "Unknown"
-                brightness = 0
-                aligned = False
-
-                # Extract current properties
-                for prop in device.get('Properties', []):
-                    if 'Status' in prop:
-                        status = prop['Status']
-                    if 'Brightness' in prop:
-                        brightness = int(prop['Brightness'])
-                    if 'Aligned' in prop:
-                        aligned = prop['Aligned'] == 'True'
-
-                return {
-                    'status': status,
-                    'brightness': brightness,
-                    'aligned': aligned,
-                    'online': device.get('Online') == 'True',
-                    'name': device.get('Name'),
-                    'location': next((p['LocationName'] for p in device.get('Parameters', [])
-                                      if 'LocationName' in p), None)
-                }
-
-        raise ValueError(f"Dimmer with UUID {device_uuid} not found")
+        device = self.get_device_status(device_uuid)
+        if device is None:
+            raise ValueError(f"Dimmer with UUID {device_uuid} not found")
+        if device.get('Model') != 'dimmer':
+            raise ValueError("Device is not a dimmer")
+
+        # Merge the current properties into a single lookup
+        props = {}
+        for prop in device.get('Properties', ()):
+            props.update(prop)
+
+        return {
+            'status': props.get('Status', "Unknown"),
+            'brightness': int(props.get('Brightness', 0)),
+            'aligned': props.get('Aligned') == 'True',
+            'online': device.get('Online') == 'True',
+            'name': device.get('Name'),
+            'location': next((p['LocationName'] for p in device.get('Parameters', [])
+                              if 'LocationName' in p), None)
+        }
 
     # Location Methods
     def list_locations(self) -> List[Dict]:
@@ -422,10 +741,9 @@ class NikoHomeControlAPI:
             return []
 
         # Extract locations from response
-        locations = []
-        for param in response["Params"]:
-            if isinstance(param, dict) and "Locations" in param:
-                locations.extend(param["Locations"])
+        locations = list(itertools.chain.from_iterable(
+            param["Locations"] for param in _params_items(response) if "Locations" in param
+        ))
 
         return locations
 
@@ -459,19 +777,18 @@ class NikoHomeControlAPI:
 
             # The response structure is different from what we expect
             # We to need to properly extract the devices
-            for param in response["Params"]:
-                if isinstance(param, dict):
-                    if "Locations" in param:
-                        for location in param["Locations"]:
-                            if location.get("Uuid") == location_uuid:
-                                return location.get("Items", [])
-                    elif "Devices" in param:  # Some systems might return devices directly
-                        return param["Devices"]
+            for param in _params_items(response):
+                if "Locations" in param:
+                    for location in param["Locations"]:
+                        if location.get("Uuid") == location_uuid:
+                            return location.get("Items", [])
+                elif "Devices" in param:  # Some systems might return devices directly
+                    return param["Devices"]
 
             return []
 
         except Exception as e:
-            print(f"Error listing devices in location: {str(e)}")
+            logger.warning("Error listing devices in location: %s", e)
             return []
 
     # System Information Methods
@@ -495,13 +812,8 @@ class NikoHomeControlAPI:
             return {}
 
         # Extract system info from response
-        for param in response["Params"]:
-            if isinstance(param, dict) and "SystemInfo" in param:
-                system_info_list = param["SystemInfo"]
-                if isinstance(system_info_list, list) and len(system_info_list) > 0:
-                    return system_info_list[0]
-
-        return {}
+        return next((param["SystemInfo"][0] for param in _params_items(response)
+                     if isinstance(param.get("SystemInfo"), list) and param["SystemInfo"]), {})
 
     def get_time_info(self) -> Dict:
         """
@@ -523,11 +835,7 @@ class NikoHomeControlAPI:
             return {}
 
         # Extract time info from response
-        for param in response["Params"]:
-            if isinstance(param, dict) and "TimeInfo" in param:
-                return param["TimeInfo"]
-
-        return {}
+        return next((param["TimeInfo"] for param in _params_items(response) if "TimeInfo" in param), {})
 
     # Notification Methods
     def list_notifications(self) -> List[Dict]:
@@ -545,10 +853,9 @@ class NikoHomeControlAPI:
             return []
 
         # Extract notifications from response
-        notifications = []
-        for param in response["Params"]:
-            if isinstance(param, dict) and "Notifications" in param:
-                notifications.extend(param["Notifications"])
+        notifications = list(itertools.chain.from_iterable(
+            param["Notifications"] for param in _params_items(response) if "Notifications" in param
+        ))
 
         return notifications
 
@@ -561,7 +868,7 @@ class NikoHomeControlAPI:
             status: New status ("read" or "new")
 
         Returns:
-            True if the update was successful, False otherwise
+            True if the broker acknowledged the update, False otherwise
         """
         payload = {
             "Method": "notifications.update",
@@ -575,9 +882,10 @@ class NikoHomeControlAPI:
         try:
             result = self.mqtt_client.publish(
                 "hobby/notification/cmd",
-                json.dumps(payload))
-            result.wait_for_publish()
-            return result.rc == mqtt.MQTT_ERR_SUCCESS
+                _json_dumps(payload),
+                qos=1)
+            result.wait_for_publish(timeout=5.0)
+            return result.rc == mqtt.MQTT_ERR_SUCCESS and result.is_published()
         except Exception:
             return False
 
@@ -595,9 +903,8 @@ class NikoHomeControlAPI:
         Raises:
             requests.exceptions.HTTPError: If the request fails
         """
-        url = f"{self.rest_base_url}/devices/{device_uuid}?latest=true"
-        headers = {"Authorization": f"Bearer {self.jwt_token}"}
-        response = requests.get(url, headers=headers, verify=self.ca_cert_path is not None)
+        url = _LATEST_URL.format(base=self.rest_base_url, uuid=device_uuid)
+        response = self._http.get(url, timeout=10)
         response.raise_for_status()
         return response.json()
 
@@ -618,15 +925,8 @@ class NikoHomeControlAPI:
         Raises:
             requests.exceptions.HTTPError: If the request fails
         """
-        url = f"{self.rest_base_url}/devices/{device_uuid}/properties/{property_name}"
-        params = {}
-        if start_time:
-            params["IntervalStart"] = start_time
-        if end_time:
-            params["IntervalEnd"] = end_time
-
-        headers = {"Authorization": f"Bearer {self.jwt_token}"}
-        response = requests.get(url, params=params, headers=headers, verify=self.ca_cert_path is not None)
+        url = _RAW_URL.format(base=self.rest_base_url, uuid=device_uuid, prop=property_name)
+        response = self._http.get(url, params=_interval_params(start_time, end_time), timeout=10)
         response.raise_for_status()
         return response.json()
 
@@ -650,15 +950,10 @@ class NikoHomeControlAPI:
         Raises:
             requests.exceptions.HTTPError: If the request fails
         """
-        url = f"{self.rest_base_url}/devices/{device_uuid}/properties/{property_name}/{interval}"
-        params = {"Aggregation": aggregation}
-        if start_time:
-            params["IntervalStart"] = start_time
-        if end_time:
-            params["IntervalEnd"] = end_time
-
-        headers = {"Authorization": f"Bearer {self.jwt_token}"}
-        response = requests.get(url, params=params, headers=headers, verify=self.ca_cert_path is not None)
+        url = _AGGREGATED_URL.format(base=self.rest_base_url, uuid=device_uuid, prop=property_name,
+                                     interval=interval)
+        response = self._http.get(url, params=_interval_params(start_time, end_time, Aggregation=aggregation),
+                                  timeout=10)
         response.raise_for_status()
         return response.json()
 
@@ -680,18 +975,59 @@ class NikoHomeControlAPI:
         Raises:
             requests.exceptions.HTTPError: If the request fails
         """
-        url = f"{self.rest_base_url}/devices/{device_uuid}/total"
-        params = {"Aggregation": aggregation}
-        if start_time:
-            params["IntervalStart"] = start_time
-        if end_time:
-            params["IntervalEnd"] = end_time
-
-        headers = {"Authorization": f"Bearer {self.jwt_token}"}
-        response = requests.get(url, params=params, headers=headers, verify=self.ca_cert_path is not None)
+        url = _TOTAL_URL.format(base=self.rest_base_url, uuid=device_uuid)
+        response = self._http.get(url, params=_interval_params(start_time, end_time, Aggregation=aggregation),
+                                  timeout=10)
         response.raise_for_status()
         return response.json()
 
+    def _get_measurement_executor(self) -> ThreadPoolExecutor:
+        """Get the thread pool used for concurrent measurement requests, creating it on first use."""
+        if self._measurement_executor is None:
+            self._measurement_executor = ThreadPoolExecutor(max_workers=8)
+        return self._measurement_executor
+
+    def get_latest_measurements_many(self, device_uuids: List[str]) -> Dict[str, Dict]:
+        """
+        Get the latest measurements for several devices concurrently.
+
+        The requests share the same HTTP session, so wall time is roughly that of the slowest request.
+
+        Args:
+            device_uuids: UUIDs of the devices to get measurements for
+
+        Returns:
+            Dictionary mapping each device UUID to its latest measurements
+
+        Raises:
+            requests.exceptions.HTTPError: If any of the requests fails
+        """
+        results = self._get_measurement_executor().map(self.get_latest_measurements, device_uuids)
+        return dict(zip(device_uuids, results))
+
+    def get_raw_measurements_many(self, device_uuids: List[str], property_name: str,
+                                  start_time: str = None, end_time: str = None) -> Dict[str, Dict]:
+        """
+        Get raw measurement values of a property for several devices concurrently.
+
+        Args:
+            device_uuids: UUIDs of the devices
+            property_name: Name of the property to get measurements for
+            start_time: Start time in ISO-8601 format (optional)
+            end_time: End time in ISO-8601 format (optional)
+
+        Returns:
+            Dictionary mapping each device UUID to its measurement data
+
+        Raises:
+            requests.exceptions.HTTPError: If any of the requests fails
+        """
+        results = self._get_measurement_executor().map(
+            lambda device_uuid: self.get_raw_measurements(device_uuid, property_name, start_time, end_time),
+            device_uuids
+        )
+        return dict(zip(device_uuids, results))
+
     def get_devices_by_location(self) -> Dict[str, Dict]:
         """
         Get a comprehensive overview of all devices organized by location.
@@ -717,24 +1053,28 @@ class NikoHomeControlAPI:
         location_overview = {}
 
         try:
-            # Get all locations
+            # Two round-trips in total; devices are grouped locally by the location in their parameters
             locations = self.list_locations()
-            print(f"Found {len(locations)} locations in the system")
+            logger.debug("Found %d locations in the system", len(locations))
 
-            # First, get ALL devices to minimize API calls
             all_devices = self.list_devices()
-            print(f"Found {len(all_devices)} total devices in system")
+            logger.debug("Found %d total devices in system", len(all_devices))
 
-            # Create a device lookup dictionary by UUID
-            device_lookup = {d['Uuid']: d for d in all_devices}
+            devices_by_location = defaultdict(list)
+            for device in all_devices:
+                try:
+                    params = {k: v for p in device.get('Parameters', []) if isinstance(p, dict) for k, v in p.items()}
+                except Exception as device_error:
+                    logger.warning("Error processing device %s: %s", device.get('Uuid'), device_error)
+                    continue
+                location_key = params.get('LocationId') or params.get('LocationUuid') or params.get('LocationName')
+                devices_by_location[location_key].append(device)
 
             for location in locations:
                 location_uuid = location['Uuid']
                 location_name = location['Name']
                 location_icon = location.get('Icon', 'unknown')
 
-                print(f"\nProcessing location: {location_name} ({location_uuid})")
-
                 # Initialize location entry
                 location_overview[location_name] = {
                     'uuid': location_uuid,
@@ -742,79 +1082,50 @@ class NikoHomeControlAPI:
                     'devices': []
                 }
 
-                try:
-                    # Get device UUIDs in this location
-                    location_devices = self.list_devices_in_location(location_uuid)
+                location_devices = devices_by_location.get(location_uuid, []) + devices_by_location.get(location_name, [])
+                if not location_devices:
+                    logger.debug("No devices found in %s", location_name)
+                    continue
 
-                    if not location_devices:
-                        print(f"No devices found in {location_name}")
+                logger.debug("Found %d devices in %s (%s)", len(location_devices), location_name, location_uuid)
+
+                for full_device in location_devices:
+                    device_uuid = full_device.get('Uuid')
+
+                    try:
+                        # Merge properties once (a single dict in older firmware, a list of dicts otherwise)
+                        props = full_device.get('Properties', ())
+                        properties = {}
+                        for prop in ((props,) if isinstance(props, dict) else props):
+                            properties.update(prop)
+
+                        # Extract device details
+                        device_details = {
+                            'uuid': device_uuid,
+                            'name': full_device.get('Name', 'Unnamed Device'),
+                            'type': full_device.get('Type', 'unknown'),
+                            'model': full_device.get('Model', 'unknown'),
+                            'online': full_device.get('Online', 'False') == 'True',
+                            'traits': full_device.get('Traits', []),
+                            'parameters': full_device.get('Parameters', []),
+                            'properties': properties,
+                            'status': properties.get('Status', properties.get('BasicState', 'unknown'))
+                        }
+
+                        location_overview[location_name]['devices'].append(device_details)
+
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug("  - %s (%s) model=%s status=%s online=%s properties=%s",
+                                         device_details['name'], device_details['type'],
+                                         device_details['model'], device_details['status'],
+                                         device_details['online'], device_details['properties'])
+
+                    except Exception as device_error:
+                        logger.warning("Error processing device %s: %s", device_uuid, device_error)
                         continue
 
-                    print(f"Found {len(location_devices)} devices in {location_name}")
-
-                    for loc_device in location_devices:
-                        device_uuid = loc_device['Uuid']
-
-                        try:
-                            # Get full device details from our lookup
-                            full_device = device_lookup.get(device_uuid)
-
-                            if not full_device:
-                                print(f"Warning: Device {device_uuid} not found in full device list")
-                                continue
-
-                            # Extract device details
-                            device_details = {
-                                'uuid': device_uuid,
-                                'name': full_device.get('Name', 'Unnamed Device'),
-                                'type': full_device.get('Type', 'unknown'),
-                                'model': full_device.get('Model', 'unknown'),
-                                'online': full_device.get('Online', 'False') == 'True',
-                                'traits': full_device.get('Traits', []),
-                                'parameters': full_device.get('Parameters', []),
-                                'properties': {},
-                                'status': 'unknown'
-                            }
-
-                            # Process properties (handling different API response formats)
-                            props = full_device.get('Properties', [])
-                            if isinstance(props, list):
-                                # Handle a list of property dictionaries
-                                for prop_dict in props:
-                                    if isinstance(prop_dict, dict):
-                                        device_details['properties'].update(prop_dict)
-                            elif isinstance(props, dict):
-                                # Handle single property dictionary
-                                device_details['properties'].update(props)
-
-                            # Determine status
-                            if 'Status' in device_details['properties']:
-                                device_details['status'] = device_details['properties']['Status']
-                            elif 'BasicState' in device_details['properties']:
-                                device_details['status'] = device_details['properties']['BasicState']
-
-                            location_overview[location_name]['devices'].append(device_details)
-
-                            # Print summary
-                            print(f"  - {device_details['name']} ({device_details['type']})")
-                            print(f"    Model: {device_details['model']}")
-                            print(f"    Status: {device_details['status']}")
-                            print(f"    Online: {device_details['online']}")
-                            if device_details['properties']:
-                                print("    Properties:")
-                                for k, v in device_details['properties'].items():
-                                    print(f"      {k}: {v}")
-
-                        except Exception as device_error:
-                            print(f"Error processing device {device_uuid}: {str(device_error)}")
-                            continue
-
-                except Exception as location_error:
-                    print(f"Error processing location {location_name}: {str(location_error)}")
-                    continue
-
         except Exception as e:
-            print(f"Fatal error generating location overview: {str(e)}")
+            logger.error("Fatal error generating location overview: %s", e)
 
         return location_overview
 
@@ -838,40 +1149,39 @@ class NikoHomeControlAPI:
         self.ensure_connection()
 
         response = None
-        response_received = False
+        done = threading.Event()
 
         def on_message(client, userdata, msg):
-            nonlocal response, response_received
+            nonlocal response
             try:
-                response = json.loads(msg.payload.decode())
-                response_received = True
+                message = _json_loads(msg.payload)
             except json.JSONDecodeError:
-                pass
-
-        # Temporarily subscribe to response topics
-        self.mqtt_client.subscribe(response_topic)
-        original_callback = self.mqtt_client.on_message
-        self.mqtt_client.on_message = on_message
+                return
+            # Replies to other requests (e.g. batched controls) share the topic; ignore them
+            if not _response_matches(payload, message):
+                return
+            response = message
+            done.set()
 
-        try:
-            # Send request
-            pub_result = self.mqtt_client.publish(request_topic, json.dumps(payload))
-            pub_result.wait_for_publish()
+        # Route only the response topic to this request; events keep flowing to _on_message
+        with self._request_locks[response_topic]:
+            self.mqtt_client.message_callback_add(response_topic, on_message)
+            self.mqtt_client.subscribe(response_topic)
 
-            # Wait for response
-            start_time = time.time()
-            while not response_received and (time.time() - start_time) < timeout:
-                time.sleep(0.1)
+            try:
+                # Send request
+                pub_result = self.mqtt_client.publish(request_topic, _json_dumps(payload))
+                pub_result.wait_for_publish()
 
-            if not response_received:
-                raise TimeoutError(f"No response received from MQTT broker within {timeout} seconds")
+                # Wait for the response; on_message wakes us as soon as it arrives
+                if not done.wait(timeout):
+                    raise TimeoutError(f"No response received from MQTT broker within {timeout} seconds")
 
-            return response
+                return response
 
-        finally:
-            # Restore original message handler
-            self.mqtt_client.on_message = original_callback
-            self.mqtt_client.unsubscribe(response_topic)
+            finally:
+                self.mqtt_client.unsubscribe(response_topic)
+                self.mqtt_client.message_callback_remove(response_topic)
 
     def identify_comfort_sensors(self) -> List[Dict]:
         """
@@ -887,48 +1197,56 @@ class NikoHomeControlAPI:
                 'properties': list of available properties
             }]
         """
-        all_devices = self.list_devices()
-        comfort_sensors = []
-
-        for device in all_devices:
-            # Check if the device has properties we care about
-            properties = device.get('Properties', [])
-
-            # Convert properties to a more usable format if needed
-            props = {}
-            for prop in properties:
-                if isinstance(prop, dict):
-                    props.update(prop)
-
-            # Check for both temperature and humidity capabilities
-            has_temp = 'AmbientTemperature' in props
-            has_humidity = 'Humidity' in props
-
-            if has_temp and has_humidity:
-                sensor_info = {
-                    'uuid': device.get('Uuid'),
-                    'name': device.get('Name', 'Unknown'),
-                    'type': device.get('Type', 'Unknown'),
-                    'properties': props
-                }
-
-                # Try to get location information if available
-                if 'Location' in device:
-                    sensor_info['location'] = device['Location'].get('Name', 'Unknown')
+        def comfort_properties(device):
+            # Check for both temperature and humidity capabilities before merging, so devices
+            # that aren't comfort sensors (most of them) never get a merged properties dict
+            properties = [prop for prop in device.get('Properties', []) if isinstance(prop, dict)]
+            if all(any(name in prop for prop in properties) for name in self._COMFORT_PROPERTIES):
+                return {k: v for prop in properties for k, v in prop.items()}
+            return None
 
-                comfort_sensors.append(sensor_info)
+        return [
+            {
+                'uuid': device.get('Uuid'),
+                'name': device.get('Name', 'Unknown'),
+                'type': device.get('Type', 'Unknown'),
+                'properties': props,
+                # Location information, if available
+                **({'location': device['Location'].get('Name', 'Unknown')} if 'Location' in device else {})
+            }
+            for device in self.list_devices()
+            for props in (comfort_properties(device),)
+            if props is not None
+        ]
 
-        return comfort_sensors
+    def _send_queued_controls(self):
+        """Publish queued controls and wait (briefly) until they have been written to the broker."""
+        try:
+            self.flush()
+            # A batch that already failed (e.g. published while disconnected) has nothing left to wait for
+            last = self._last_control_publish
+            if last is not None and last.rc == mqtt.MQTT_ERR_SUCCESS and not last.is_published():
+                last.wait_for_publish(timeout=5.0)
+        except Exception as e:
+            logger.warning("Error sending queued controls: %s", e)
 
     def close(self):
         """Clean up resources."""
+        # Let queued controls reach the broker before the network loop stops
+        self._send_queued_controls()
+        _open_clients.discard(self)
+
         try:
             self.mqtt_client.loop_stop()
             self.mqtt_client.disconnect()
         except Exception as e:
-            print(f"Error during disconnect: {str(e)}")
+            logger.warning("Error during disconnect: %s", e)
         finally:
+            self._http.close()
+            if self._measurement_executor is not None:
+                self._measurement_executor.shutdown(wait=False)
             self._connected = False
+            self._connected_evt.clear()
 
     def __enter__(self):
         """Context manager entry."""
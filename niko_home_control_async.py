@@ -0,0 +1,481 @@
+import asyncio
+import inspect
+import logging
+import ssl
+from typing import List, Dict, Any, Optional, Callable, Union
+
+import aiomqtt
+import httpx
+
+from niko_home_control import (_AGGREGATED_URL, _LATEST_URL, _RAW_URL, _TOTAL_URL, _EventRouter, _interval_params,
+                               _json_dumps, _json_loads, _params_items, _response_matches, _topics)
+
+logger = logging.getLogger(__name__)
+
+
+class NikoHomeControlAPIAsync(_EventRouter):
+    """
+    Asyncio implementation of the Niko Home Control API.
+    Uses aiomqtt for MQTT and httpx for REST, so message handling, device control and measurement
+    requests all run on the event loop and can be awaited concurrently (e.g. with asyncio.gather).
+
+    Use it as an async context manager:
+
+        async with NikoHomeControlAPIAsync(host, username, jwt_token, ca_cert_path) as niko:
+            devices = await niko.list_devices()
+
+    It covers the core MQTT and measurement methods of NikoHomeControlAPI. The convenience
+    helpers built on top of them (get_dimmer_status, get_devices_by_location,
+    identify_comfort_sensors, get_*_measurements_many) and control batching/flush() are only
+    available in the threaded client; controls are published immediately here.
+
+    If the connection to the broker drops, requests waiting for a response fail with
+    aiomqtt.MqttError, and so do new requests until the client has reconnected. The client
+    reconnects in the background with exponential backoff (1 s up to 60 s). Callbacks resume
+    once it is back; events published while disconnected are not delivered.
+
+    Callbacks may be plain functions or coroutine functions. Callbacks of the same kind all receive
+    the same event dictionary, so they should treat it as read-only.
+    """
+
+    _EVENT_TOPICS = _topics(
+        "hobby/control/devices/evt",
+        "hobby/control/locations/evt",
+        "hobby/notification/evt",
+        "hobby/system/evt",
+        "hobby/control/devices/err",
+        "hobby/control/locations/err",
+        "hobby/notification/err",
+        "hobby/system/err",
+    )
+
+    # Response topics stay subscribed, so requests don't pay a subscribe/unsubscribe round-trip
+    _RESPONSE_TOPICS = _topics(
+        "hobby/control/devices/rsp",
+        "hobby/control/locations/rsp",
+        "hobby/notification/rsp",
+        "hobby/system/rsp",
+    )
+    _RESPONSE_TOPIC_NAMES = frozenset(topic for topic, _ in _RESPONSE_TOPICS)
+
+    def __init__(self, host: str, username: str, jwt_token: str, ca_cert_path: str = None):
+        """
+        Initialize the asynchronous Niko Home Control API. Call connect() (or use "async with") before use.
+
+        Args:
+            host: The hostname or IP address of the Niko Home Control controller
+            username: MQTT username provided by Niko (typically "hobby")
+            jwt_token: JWT token provided by Niko
+            ca_cert_path: Path to CA certificate file (optional)
+        """
+        self.host = host
+        self.username = username
+        self.jwt_token = jwt_token
+        self.ca_cert_path = ca_cert_path
+
+        self._ssl_context = None
+        if ca_cert_path:
+            self._ssl_context = ssl.create_default_context(cafile=ca_cert_path)
+
+        # Base URLs
+        self.mqtt_port = 8884
+        self.rest_base_url = f"https://{host}/measurements/v1"
+
+        self._mqtt = None
+        self._http = None
+        self._reader_task = None
+
+        # Callback handlers
+        self.device_callbacks = []
+        self.location_callbacks = []
+        self.notification_callbacks = []
+        self.system_callbacks = []
+        self.error_callbacks = []
+        self._init_dispatch()
+
+        # One request in flight per response topic: (request payload, future), resolved by the message reader
+        self._pending = {}
+        self._request_locks = {}
+
+        # Running coroutine callbacks, referenced until they finish
+        self._callback_tasks = set()
+
+    async def connect(self):
+        """Connect to the MQTT broker and start handling incoming messages."""
+        self._mqtt = aiomqtt.Client(self.host, port=self.mqtt_port, username=self.username,
+                                    password=self.jwt_token, tls_context=self._ssl_context)
+        await self._connect_mqtt()
+        self._reader_task = asyncio.create_task(self._read_messages())
+
+        self._http = httpx.AsyncClient(headers={"Authorization": f"Bearer {self.jwt_token}"},
+                                       verify=self._ssl_context if self._ssl_context is not None else False,
+                                       timeout=10)
+
+    async def _connect_mqtt(self):
+        """Connect the MQTT client and subscribe to the event and response topics."""
+        await self._mqtt.__aenter__()
+        logger.info("Connected to MQTT broker")
+        await self._mqtt.subscribe(self._EVENT_TOPICS + self._RESPONSE_TOPICS)
+
+    async def _reconnect_mqtt(self, delay: float = 1.0, max_delay: float = 60.0):
+        """Reconnect after the connection was lost, retrying with exponential backoff until it succeeds."""
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                # Release the lost connection first; this returns right away if it's already closed
+                await self._mqtt.__aexit__(None, None, None)
+                await self._connect_mqtt()
+                return
+            except aiomqtt.MqttError as e:
+                logger.warning("Reconnecting to MQTT broker failed: %s", e)
+                delay = min(delay * 2, max_delay)
+
+    async def close(self):
+        """Clean up resources."""
+        try:
+            if self._reader_task is not None:
+                self._reader_task.cancel()
+                try:
+                    await self._reader_task
+                except asyncio.CancelledError:
+                    pass
+            if self._mqtt is not None:
+                await self._mqtt.__aexit__(None, None, None)
+            if self._http is not None:
+                await self._http.aclose()
+        except Exception as e:
+            logger.warning("Error during disconnect: %s", e)
+        finally:
+            self._reader_task = None
+            self._mqtt = None
+            self._http = None
+
+    async def __aenter__(self):
+        """Async context manager entry."""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit."""
+        await self.close()
+
+    async def _read_messages(self):
+        """Route incoming MQTT messages to pending requests or event callbacks, reconnecting when the connection drops."""
+        while True:
+            try:
+                async for message in self._mqtt.messages:
+                    self._handle_message(message)
+                return
+            except aiomqtt.MqttError as e:
+                # No more responses will arrive; fail waiting requests with the real error, not a timeout
+                logger.error("Lost connection to MQTT broker: %s", e)
+                for _, future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(e)
+
+            await self._reconnect_mqtt()
+
+    def _handle_message(self, message: aiomqtt.Message):
+        """Resolve the pending request a response belongs to, or pass an event to the callbacks."""
+        try:
+            topic = message.topic.value
+            payload = _json_loads(message.payload)
+
+            if topic in self._RESPONSE_TOPIC_NAMES:
+                # Responses to requests we didn't make (or that timed out) are ignored
+                request, future = self._pending.get(topic, (None, None))
+                if future is not None and not future.done() and _response_matches(request, payload):
+                    future.set_result(payload)
+                return
+
+            self._route_event(topic, payload)
+
+        except ValueError:
+            logger.warning("Failed to decode MQTT message: %r", message.payload)
+        except Exception as e:
+            logger.error("Error processing message: %s", e)
+
+    def _emit(self, callbacks: List[Callable[[Dict], Any]], event: Dict):
+        """
+        Pass one event dictionary to every callback.
+
+        Coroutine callbacks run as separate tasks, so they can await API requests without
+        blocking the message reader that delivers the responses.
+        """
+        for callback in callbacks:
+            result = callback(event)
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._callback_tasks.add(task)
+                task.add_done_callback(self._callback_tasks.discard)
+
+    # Callback registration methods
+    def register_device_callback(self, callback: Callable[[Dict], Any]):
+        """Register a callback for device events."""
+        self.device_callbacks.append(callback)
+
+    def register_location_callback(self, callback: Callable[[Dict], Any]):
+        """Register a callback for location events."""
+        self.location_callbacks.append(callback)
+
+    def register_notification_callback(self, callback: Callable[[Dict], Any]):
+        """Register a callback for notification events."""
+        self.notification_callbacks.append(callback)
+
+    def register_system_callback(self, callback: Callable[[Dict], Any]):
+        """Register a callback for system events."""
+        self.system_callbacks.append(callback)
+
+    def register_error_callback(self, callback: Callable[[Dict], Any]):
+        """Register a callback for error messages."""
+        self.error_callbacks.append(callback)
+
+    async def _mqtt_request(self, request_topic: str, response_topic: str, payload: Dict,
+                            timeout: float = 5.0) -> Optional[Dict]:
+        """
+        Helper method to send MQTT request and wait for response.
+
+        Args:
+            request_topic: Topic to publish the request to
+            response_topic: Topic on which the response arrives
+            payload: Payload to send
+            timeout: Timeout in seconds
+
+        Returns:
+            Response payload as dictionary
+
+        Raises:
+            TimeoutError: If no response is received within a timeout period
+            aiomqtt.MqttError: If the connection to the broker is lost, or not yet re-established
+        """
+        # The API has no correlation ids, so requests sharing a response topic take turns
+        lock = self._request_locks.setdefault(response_topic, asyncio.Lock())
+        async with lock:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[response_topic] = (payload, future)
+            try:
+                await self._mqtt.publish(request_topic, _json_dumps(payload))
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"No response received from MQTT broker within {timeout} seconds") from None
+            finally:
+                self._pending.pop(response_topic, None)
+
+    # Device Management Methods
+    async def list_devices(self) -> List[Dict]:
+        """
+        Get a list of all devices in the installation.
+
+        Returns:
+            List of device dictionaries
+        """
+        response = await self._mqtt_request(
+            "hobby/control/devices/cmd",
+            "hobby/control/devices/rsp",
+            {"Method": "devices.list"}
+        )
+        return [device for param in _params_items(response or {}) for device in param.get("Devices", [])]
+
+    async def control_device(self, device_uuid: str, properties: Union[Dict[str, Any], List[Dict[str, Any]]],
+                             wait_for_response: bool = False) -> Optional[Dict]:
+        """
+        Control a device by setting its properties.
+
+        Args:
+            device_uuid: UUID of the device to control
+            properties: Either a single property dictionary or list of property dictionaries
+            wait_for_response: Whether to wait for a response from the device
+
+        Returns:
+            Response payload if wait_for_response is True, None otherwise
+        """
+        payload = {
+            "Method": "devices.control",
+            "Params": [{
+                "Devices": [{
+                    "Uuid": device_uuid,
+                    "Properties": properties
+                }]
+            }]
+        }
+
+        if wait_for_response:
+            return await self._mqtt_request(
+                "hobby/control/devices/cmd",
+                "hobby/control/devices/rsp",
+                payload
+            )
+
+        await self._mqtt.publish("hobby/control/devices/cmd", _json_dumps(payload), qos=0)
+        return None
+
+    async def set_device_position(self, device_uuid: str, position: int,
+                                  wait_for_response: bool = False) -> Optional[Dict]:
+        """Convenience method to set device position (for blinds, etc.)"""
+        return await self.control_device(device_uuid, [{"Position": str(position)}], wait_for_response)
+
+    async def set_device_status(self, device_uuid: str, status: str,
+                                wait_for_response: bool = False) -> Optional[Dict]:
+        """Convenience method to set device status (on/off)"""
+        return await self.control_device(device_uuid, [{"Status": status}], wait_for_response)
+
+    async def set_device_brightness(self, device_uuid: str, brightness: int,
+                                    wait_for_response: bool = False) -> Optional[Dict]:
+        """Convenience method to set device brightness (for dimmers)"""
+        return await self.control_device(device_uuid, [{"Brightness": str(brightness)}], wait_for_response)
+
+    async def get_device_status(self, device_uuid: str) -> Optional[Dict]:
+        """
+        Get the current status of a device.
+
+        Args:
+            device_uuid: UUID of the device
+
+        Returns:
+            The device dictionary, or None if the device doesn't exist
+        """
+        devices = await self.list_devices()
+        return next((device for device in devices if device.get("Uuid") == device_uuid), None)
+
+    # Location Methods
+    async def list_locations(self) -> List[Dict]:
+        """Get a list of all locations in the installation."""
+        response = await self._mqtt_request(
+            "hobby/control/locations/cmd",
+            "hobby/control/locations/rsp",
+            {"Method": "locations.list"}
+        )
+        return [location for param in _params_items(response or {}) for location in param.get("Locations", [])]
+
+    async def list_devices_in_location(self, location_uuid: str) -> List[Dict]:
+        """
+        Get a list of devices in a specified location.
+
+        Args:
+            location_uuid: UUID of the location to query
+
+        Returns:
+            List of devices in the location
+        """
+        payload = {
+            "Method": "locations.listitems",
+            "Params": [{
+                "Locations": [{"Uuid": location_uuid}]
+            }]
+        }
+        response = await self._mqtt_request(
+            "hobby/control/locations/cmd",
+            "hobby/control/locations/rsp",
+            payload
+        )
+
+        for param in _params_items(response or {}):
+            if "Locations" in param:
+                for location in param["Locations"]:
+                    if location.get("Uuid") == location_uuid:
+                        return location.get("Items", [])
+            elif "Devices" in param:  # Some systems might return devices directly
+                return param["Devices"]
+
+        return []
+
+    # System Information Methods
+    async def get_system_info(self) -> Dict:
+        """Get system information."""
+        response = await self._mqtt_request("hobby/system/cmd", "hobby/system/rsp", {"Method": "systeminfo.publish"})
+        return next((param["SystemInfo"][0] for param in _params_items(response or {})
+                     if isinstance(param.get("SystemInfo"), list) and param["SystemInfo"]), {})
+
+    async def get_time_info(self) -> Dict:
+        """Get time information from the system."""
+        response = await self._mqtt_request("hobby/system/cmd", "hobby/system/rsp", {"Method": "time.publish"})
+        return next((param["TimeInfo"] for param in _params_items(response or {}) if "TimeInfo" in param), {})
+
+    # Notification Methods
+    async def list_notifications(self) -> List[Dict]:
+        """Get a list of all notifications."""
+        response = await self._mqtt_request(
+            "hobby/notification/cmd",
+            "hobby/notification/rsp",
+            {"Method": "notifications.list"}
+        )
+        return [notification for param in _params_items(response or {})
+                for notification in param.get("Notifications", [])]
+
+    async def update_notification(self, notification_uuid: str, status: str) -> bool:
+        """
+        Update the notification status.
+
+        Args:
+            notification_uuid: UUID of the notification to update
+            status: New status ("read" or "new")
+
+        Returns:
+            True if the broker acknowledged the update, False otherwise
+        """
+        payload = {
+            "Method": "notifications.update",
+            "Params": {
+                "Notifications": [{
+                    "Uuid": notification_uuid,
+                    "Status": status
+                }]
+            }
+        }
+        try:
+            await self._mqtt.publish("hobby/notification/cmd", _json_dumps(payload), qos=1, timeout=5.0)
+            return True
+        except Exception:
+            return False
+
+    # Measurement Data Methods (REST API)
+    async def _get_json(self, url: str, params: Optional[Dict] = None) -> Dict:
+        """GET a measurement endpoint and return the decoded JSON body."""
+        response = await self._http.get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def get_latest_measurements(self, device_uuid: str) -> Dict:
+        """
+        Get the latest measurements for a specific device.
+
+        Raises:
+            httpx.HTTPStatusError: If the request fails
+        """
+        return await self._get_json(_LATEST_URL.format(base=self.rest_base_url, uuid=device_uuid))
+
+    async def get_raw_measurements(self, device_uuid: str, property_name: str,
+                                   start_time: str = None, end_time: str = None) -> Dict:
+        """
+        Get raw measurement values for a given device property.
+
+        Raises:
+            httpx.HTTPStatusError: If the request fails
+        """
+        return await self._get_json(_RAW_URL.format(base=self.rest_base_url, uuid=device_uuid, prop=property_name),
+                                    _interval_params(start_time, end_time))
+
+    async def get_aggregated_measurements(self, device_uuid: str, property_name: str, interval: str,
+                                          start_time: str = None, end_time: str = None,
+                                          aggregation: str = "sum") -> Dict:
+        """
+        Get aggregated measurement values for a given device property.
+
+        Raises:
+            httpx.HTTPStatusError: If the request fails
+        """
+        return await self._get_json(
+            _AGGREGATED_URL.format(base=self.rest_base_url, uuid=device_uuid, prop=property_name, interval=interval),
+            _interval_params(start_time, end_time, Aggregation=aggregation))
+
+    async def get_total_measurements(self, device_uuid: str,
+                                     start_time: str = None, end_time: str = None,
+                                     aggregation: str = "sum") -> Dict:
+        """
+        Get aggregated measurement values for all properties of a given device.
+
+        Raises:
+            httpx.HTTPStatusError: If the request fails
+        """
+        return await self._get_json(_TOTAL_URL.format(base=self.rest_base_url, uuid=device_uuid),
+                                    _interval_params(start_time, end_time, Aggregation=aggregation))